@@ -0,0 +1,33 @@
+import os
+import msgspec
+import numpy as np
+from game_data import json_to_arrays
+
+# --- CONFIG ---
+FILTER_FOLDER = "filter"
+
+
+def main():
+    converted = 0
+    with os.scandir(FILTER_FOLDER) as it:
+        weeks = [e for e in it if e.is_dir()]
+
+    for week in weeks:
+        with os.scandir(week.path) as it:
+            games = [e for e in it if e.name.endswith(".json")]
+
+        for game in games:
+            try:
+                times, prices = json_to_arrays(game.path)
+            except msgspec.DecodeError:
+                print(f"Skipping {game.name}: invalid JSON.")
+                continue
+            npz_path = game.path[:-len(".json")] + ".npz"
+            np.savez(npz_path, t=times, p=prices)
+            converted += 1
+
+    print(f"Converted {converted} game files to .npz arrays in {FILTER_FOLDER}")
+
+
+if __name__ == "__main__":
+    main()
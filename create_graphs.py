@@ -1,6 +1,11 @@
 import os
-import json
-from datetime import datetime
+import msgspec
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from scipy.signal import lfilter
+from game_data import load_arrays
+import matplotlib
+matplotlib.use("Agg")  # render straight to files, no GUI backend
 import matplotlib.pyplot as plt
 
 # --- configuration ---
@@ -10,6 +15,10 @@ GRAPH_FOLDER = "graphs"
 # --- EMA parameters ---
 EMA_ALPHA = 0.3  # smoothing factor: 0 < alpha <= 1, higher = more responsive
 
+# --- outlier parameters ---
+SPIKE_FILTER = "bidirectional"  # "bidirectional" (EMA + MAD) or "neighbor" (both neighbours on one side)
+SPIKE_Q = 3.0                   # robust z-score a spike must exceed against both EMAs
+
 # ensure base graph directory exists
 os.makedirs(GRAPH_FOLDER, exist_ok=True)
 
@@ -20,95 +29,142 @@ def remove_outliers(times, values):
     """Remove isolated spikes: if both neighbors are on the same side of a point."""
     if len(values) < 3:
         return times, values
-    cleaned_times = [times[0]]
-    cleaned_values = [values[0]]
-    for i in range(1, len(values) - 1):
-        prev_val, curr_val, next_val = values[i - 1], values[i], values[i + 1]
-        if (prev_val > curr_val and next_val > curr_val) or (prev_val < curr_val and next_val < curr_val):
-            continue  # skip spike
-        cleaned_times.append(times[i])
-        cleaned_values.append(curr_val)
-    cleaned_times.append(times[-1])
-    cleaned_values.append(values[-1])
-    return cleaned_times, cleaned_values
-
-def incremental_ema_smoother(alpha=EMA_ALPHA):
-    """Returns a function to incrementally smooth points using EMA."""
-    ema = None
-    def smooth_next(point):
-        nonlocal ema
-        if ema is None:
-            ema = point
-        else:
-            ema = alpha * point + (1 - alpha) * ema
-        return ema
-    return smooth_next
-
-# --- loop through each week ---
-for week_name in os.listdir(FILTER_FOLDER):
-    week_path = os.path.join(FILTER_FOLDER, week_name)
-    if not os.path.isdir(week_path):
-        continue
-
-    week_graph_folder = os.path.join(GRAPH_FOLDER, week_name)
-    os.makedirs(week_graph_folder, exist_ok=True)
-
-    # --- process each game JSON ---
-    for filename in os.listdir(week_path):
-        if not filename.endswith(".json"):
-            continue
-
-        file_path = os.path.join(week_path, filename)
-        graph_path = os.path.join(week_graph_folder, filename.replace(".json", ".png"))
-
-        with open(file_path, "r") as f:
-            try:
-                data = json.load(f)
-            except json.JSONDecodeError:
-                print(f"Skipping {filename}: invalid JSON.")
-                continue
-
-        if not data:
-            print(f"Skipping empty file: {filename}")
-            continue
-
-        # parse times and prices
-        try:
-            times = [datetime.fromisoformat(e["time"]) for e in data if e["price_cents"] is not None]
-            prices = [e["price_cents"] / 100 for e in data if e["price_cents"] is not None]
-        except Exception as e:
-            print(f"Error parsing {filename}: {e}")
-            continue
-
-        if len(times) < 3:
-            print(f"Not enough data points in {filename}")
-            continue
-
-        # remove outliers
+    prev_val, curr_val, next_val = values[:-2], values[1:-1], values[2:]
+    keep = np.ones(len(values), dtype=bool)
+    keep[1:-1] = ~(((prev_val > curr_val) & (next_val > curr_val)) | ((prev_val < curr_val) & (next_val < curr_val)))
+    return times[keep], values[keep]
+
+def ema(values, alpha=EMA_ALPHA):
+    """EMA over a whole array, seeded with the first point (the same recursion simulate_live applies per tick)."""
+    smoothed = np.empty_like(values)
+    smoothed[0] = values[0]
+    smoothed[1:], _ = lfilter([alpha], [1, alpha - 1], values[1:], zi=[(1 - alpha) * values[0]])
+    return smoothed
+
+def remove_spikes(times, values, alpha=EMA_ALPHA, q=SPIKE_Q):
+    """
+    Remove points that sit more than q robust standard deviations (MAD) away from
+    both a forward and a backward EMA, on the same side of each.
+    """
+    if len(values) < 3:
+        return times, values
+    resid_fwd = values - ema(values, alpha)
+    resid_bwd = values - ema(values[::-1], alpha)[::-1]
+    mad = 1.4826 * np.median(np.abs(resid_fwd - np.median(resid_fwd)))
+    if mad == 0:
+        return times, values
+    limit = q * mad
+    spikes = (
+        (np.abs(resid_fwd) > limit)
+        & (np.abs(resid_bwd) > limit)
+        & (np.sign(resid_fwd) == np.sign(resid_bwd))
+    )
+    return times[~spikes], values[~spikes]
+
+# --- load and smooth one game JSON (runs in the main process) ---
+def load_series(file_path, filename):
+    """
+    Return (times, prices, cleaned_times, smoothed_prices, kickoff_time) as numpy
+    arrays ready to plot, or None if the file should be skipped.
+    """
+    # parse times and prices (from the .npz cache when convert_to_npz.py has run)
+    try:
+        all_times, price_cents = load_arrays(file_path)
+    except msgspec.DecodeError:
+        print(f"Skipping {filename}: invalid JSON.")
+        return None
+    except Exception as e:
+        print(f"Error parsing {filename}: {e}")
+        return None
+
+    if len(all_times) == 0:
+        print(f"Skipping empty file: {filename}")
+        return None
+
+    has_price = ~np.isnan(price_cents)
+    times = all_times[has_price]
+    prices = price_cents[has_price].astype(np.float64) / 100
+
+    if len(times) < 3:
+        print(f"Not enough data points in {filename}")
+        return None
+
+    # remove outliers
+    if SPIKE_FILTER == "bidirectional":
+        cleaned_times, cleaned_prices = remove_spikes(times, prices)
+    else:
         cleaned_times, cleaned_prices = remove_outliers(times, prices)
 
-        # incremental EMA smoothing
-        smoother = incremental_ema_smoother(alpha=EMA_ALPHA)
-        smoothed_prices = [smoother(p) for p in cleaned_prices]
-
-        # detect kickoff time (first timestamp)
-        kickoff_time = min(times)
-
-        # --- plot ---
-        plt.figure(figsize=(10, 6))
-        plt.plot(times, prices, color="lightgray", alpha=0.5, label="Raw Price")
-        plt.plot(cleaned_times, smoothed_prices, color="blue", linewidth=2, label="Smoothed Price (EMA)")
-        plt.axvline(kickoff_time, color="red", linestyle="--", linewidth=1.5, label="Kickoff")
-        plt.xlabel("Time")
-        plt.ylabel("Win Probability")
-        plt.title(f"Odds Movement - {filename}")
-        plt.ylim(0, 1)
-        plt.xticks(rotation=45)
-        plt.legend()
-        plt.tight_layout()
-        plt.savefig(graph_path)
-        plt.close()
-
-        print(f"Graph saved: {graph_path}")
-
-print(f"\nAll graphs generated successfully with incremental EMA smoothing (alpha={EMA_ALPHA}).")
+    # EMA smoothing
+    smoothed_prices = ema(cleaned_prices)
+
+    # detect kickoff time (first timestamp)
+    kickoff_time = times.min()
+
+    return times, prices, cleaned_times, smoothed_prices, kickoff_time
+
+# --- render one graph (runs in worker processes) ---
+_figure = None  # (fig, ax, raw_line, smooth_line, kick_line), built once per worker
+
+def _get_figure():
+    """Build the figure, lines and legend once; later graphs only swap the data."""
+    global _figure
+    if _figure is None:
+        fig, ax = plt.subplots(figsize=(10, 6))
+        raw_line, = ax.plot([], [], color="lightgray", alpha=0.5, label="Raw Price")
+        smooth_line, = ax.plot([], [], color="blue", linewidth=2, label="Smoothed Price (EMA)")
+        kick_line = ax.axvline(0, color="red", linestyle="--", linewidth=1.5, label="Kickoff")
+        ax.xaxis.axis_date()
+        ax.set_xlabel("Time")
+        ax.set_ylabel("Win Probability")
+        ax.set_ylim(0, 1)
+        ax.tick_params(axis="x", labelrotation=45)
+        ax.legend()
+        _figure = (fig, ax, raw_line, smooth_line, kick_line)
+    return _figure
+
+def render_job(times, prices, cleaned_times, smoothed_prices, kickoff_time, graph_path, title):
+    fig, ax, raw_line, smooth_line, kick_line = _get_figure()
+    raw_line.set_data(times, prices)
+    smooth_line.set_data(cleaned_times, smoothed_prices)
+    kick_line.set_xdata([kickoff_time, kickoff_time])
+    ax.set_title(title)
+    ax.relim()
+    ax.autoscale_view(scaley=False)
+    fig.tight_layout()
+    fig.savefig(graph_path)
+
+    print(f"Graph saved: {graph_path}")
+
+def main():
+    # savefig dominates, so the main process only loads data and queues renders
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        renders = []
+
+        # --- loop through each week ---
+        with os.scandir(FILTER_FOLDER) as it:
+            weeks = [e for e in it if e.is_dir()]
+
+        for week in weeks:
+            week_graph_folder = os.path.join(GRAPH_FOLDER, week.name)
+            os.makedirs(week_graph_folder, exist_ok=True)
+
+            # --- process each game JSON ---
+            with os.scandir(week.path) as it:
+                games = [e for e in it if e.name.endswith(".json")]
+
+            for game in games:
+                graph_path = os.path.join(week_graph_folder, game.name.replace(".json", ".png"))
+
+                series = load_series(game.path, game.name)
+                if series is None:
+                    continue
+                renders.append(executor.submit(render_job, *series, graph_path, f"Odds Movement - {game.name}"))
+
+        for render in renders:
+            render.result()
+
+    print(f"\nAll graphs generated successfully with EMA smoothing (alpha={EMA_ALPHA}).")
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,12 @@
 import os
-import json
+import msgspec
 import csv
+import logging
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from datetime import datetime, timedelta
+from game_data import Entry, entries_decoder
 
 # --- CONFIG ---
 GAMES_FOLDER = "games"
@@ -9,14 +14,19 @@ OUTPUT_FOLDER = "filter"
 SUMMARY_FILE = os.path.join(OUTPUT_FOLDER, "summary.csv")
 
 FIRST_THURSDAY = datetime(2025, 9, 4)  # start of week 1
+NUM_WEEKS = 18                           # regular-season weeks
 MINUTE_WINDOW = 10                       # number of minutes to check for price variability
 VARIABILITY_THRESHOLD = 4               # minimum meaningful price changes within a window
 MIN_PRICE_MOVE = 2                       # minimum price_cents change to count as meaningful
 PRE_GAME_BUFFER = timedelta(minutes=10) # capture 10 minutes before kickoff
 CONSECUTIVE_WINDOWS = 4                 # require consecutive windows meeting threshold
+LOG_LEVEL = logging.INFO                # logging.WARNING hides the per-file progress lines
 
-# --- Create week boundaries (Thursdays) ---
-def generate_weeks(num_weeks=18):
+logging.basicConfig(level=LOG_LEVEL, format="%(message)s")
+log = logging.getLogger("filter")
+
+# --- Create week boundaries (Thursdays), for checking get_week_number ---
+def generate_weeks(num_weeks=NUM_WEEKS):
     weeks = []
     for i in range(num_weeks):
         start = FIRST_THURSDAY + timedelta(weeks=i)
@@ -24,126 +34,126 @@ def generate_weeks(num_weeks=18):
         weeks.append((i + 1, start, end))
     return weeks
 
-weeks = generate_weeks()
-
 def get_week_number(dt):
-    for week_num, start, end in weeks:
-        if start <= dt < end:
-            return week_num
-    return None
+    # weeks are uniform 7-day blocks from FIRST_THURSDAY, so no boundary scan is needed
+    delta = (dt - FIRST_THURSDAY).days
+    if delta < 0 or delta >= NUM_WEEKS * 7:
+        return None
+    return delta // 7 + 1
+
+# --- Helper to fill nulls ---
+def forward_fill(prices):
+    """
+    Replaces NaN with the previous valid price. Leading NaNs (no earlier price) stay NaN.
+    """
+    positions = np.where(~np.isnan(prices), np.arange(len(prices)), 0)
+    return prices[np.maximum.accumulate(positions)]
 
 # --- Kickoff detection with consecutive windows ---
-def detect_kickoff(entries, minute_window=MINUTE_WINDOW, 
+def detect_kickoff(times, prices, minute_window=MINUTE_WINDOW, 
                     variability_threshold=VARIABILITY_THRESHOLD, 
                     min_price_move=MIN_PRICE_MOVE,
                     consecutive_windows=CONSECUTIVE_WINDOWS):
     """
     Detect kickoff by requiring multiple consecutive windows with meaningful price moves.
+    Takes datetime64 times and forward-filled prices (see forward_fill).
     """
-    if len(entries) < minute_window:
+    if len(prices) < minute_window:
         return None
 
-    # Fill missing values with last valid price
-    filled = []
-    last_valid = None
-    for e in entries:
-        price = e["price_cents"]
-        if price is None:
-            if last_valid is not None:
-                filled.append({"time": e["time"], "price_cents": last_valid})
-        else:
-            filled.append(e)
-            last_valid = price
-
-    if not filled:
+    # Skip the leading points that have no price yet
+    has_price = ~np.isnan(prices)
+    if not has_price.any():
         return None
+    first = has_price.argmax()
+    filled = prices[first:]
 
-    consecutive_count = 0
-    for i in range(len(filled) - minute_window):
-        window = filled[i:i + minute_window]
-        prices = [e["price_cents"] for e in window]
-        changes = sum(abs(prices[j] - prices[j - 1]) >= min_price_move for j in range(1, len(prices)))
+    # Meaningful moves between consecutive points, counted per window in one pass
+    num_windows = len(filled) - minute_window
+    if num_windows >= consecutive_windows:
+        moves = (np.abs(np.diff(filled)) >= min_price_move).astype(np.int32)
+        changes = np.convolve(moves, np.ones(minute_window - 1, dtype=np.int32), mode="valid")[:num_windows]
+        qualifies = changes >= variability_threshold
 
-        if changes >= variability_threshold:
-            consecutive_count += 1
-            if consecutive_count >= consecutive_windows:
-                return datetime.fromisoformat(filled[i - consecutive_windows + 1]["time"])
-        else:
-            consecutive_count = 0
+        # First run of consecutive qualifying windows
+        runs = sliding_window_view(qualifies, consecutive_windows).all(axis=1)
+        if runs.any():
+            return times[first + runs.argmax()].item()
 
     # Fallback: first valid price
-    return datetime.fromisoformat(filled[0]["time"])
+    return times[first].item()
 
-# --- Helper to fill or clean nulls ---
-def fill_null_prices(data):
+# --- Per-file processing (runs in worker processes) ---
+def process_file(filename):
     """
-    Replaces None with previous valid value, and removes leading None entries.
+    Filter one game file into its week folder.
+    Returns the summary row, or None if the file was skipped.
     """
-    cleaned = []
-    last_valid = None
-    for entry in data:
-        price = entry["price_cents"]
-        if price is None:
-            if last_valid is not None:
-                entry["price_cents"] = last_valid
-                cleaned.append(entry)
-        else:
-            last_valid = price
-            cleaned.append(entry)
-    return cleaned
-
-# --- Main processing ---
-os.makedirs(OUTPUT_FOLDER, exist_ok=True)
-summary_rows = [("filename", "week", "kickoff_time", "entries_kept")]
-
-for filename in os.listdir(GAMES_FOLDER):
-    if not filename.endswith(".json"):
-        continue
-
     filepath = os.path.join(GAMES_FOLDER, filename)
-    with open(filepath, "r") as f:
+    with open(filepath, "rb") as f:
         try:
-            data = json.load(f)
-        except json.JSONDecodeError:
-            print(f"Skipping {filename}: invalid JSON.")
-            continue
+            data = entries_decoder.decode(f.read())
+        except msgspec.DecodeError:
+            log.warning(f"Skipping {filename}: invalid JSON.")
+            return None
 
     # Sort by time
-    data.sort(key=lambda x: x["time"])
+    data.sort(key=lambda x: x.time)
 
-    kickoff = detect_kickoff(data)
+    # One pass into typed arrays shared by kickoff detection, the start cut and the output
+    # (timestamps at seconds precision, any offset suffix dropped)
+    times = np.array([e.time[:19] for e in data], dtype="datetime64[s]")
+    raw_prices = np.array([e.price_cents if e.price_cents is not None else np.nan for e in data], dtype=np.float64)
+    prices = forward_fill(raw_prices)
+
+    kickoff = detect_kickoff(times, prices)
     if not kickoff:
-        print(f"⚠️ No kickoff detected for {filename}, skipping.")
-        continue
+        log.warning(f"⚠️ No kickoff detected for {filename}, skipping.")
+        return None
 
+    # Keep from the start time on, minus any leading entries that were null
     start_time = kickoff - PRE_GAME_BUFFER
-    filtered = [e for e in data if datetime.fromisoformat(e["time"]) >= start_time]
-
-    # Clean null prices
-    filtered = fill_null_prices(filtered)
-    if not filtered:
-        print(f"⚠️ All entries null after filtering for {filename}, skipping.")
-        continue
+    start = np.searchsorted(times, np.datetime64(start_time))
+    has_price = ~np.isnan(raw_prices[start:])
+    if not has_price.any():
+        log.warning(f"⚠️ All entries null after filtering for {filename}, skipping.")
+        return None
+    start += has_price.argmax()
 
     # Determine week (based on kickoff)
     week_num = get_week_number(kickoff)
     if not week_num:
-        print(f"⚠️ Could not determine week for {filename}, skipping.")
-        continue
+        log.warning(f"⚠️ Could not determine week for {filename}, skipping.")
+        return None
 
     week_folder = os.path.join(OUTPUT_FOLDER, f"week{week_num}")
     os.makedirs(week_folder, exist_ok=True)
 
     out_path = os.path.join(week_folder, filename)
-    with open(out_path, "w") as f:
-        json.dump(filtered, f, indent=2)
+    # Rebuild entries only for the final write
+    filtered = [Entry(data[i].time, int(prices[i])) for i in range(start, len(data))]
+    with open(out_path, "wb") as f:
+        f.write(msgspec.json.format(msgspec.json.encode(filtered), indent=2))
+
+    log.info(f"✅ Filtered {filename} → {out_path} ({len(filtered)} entries)")
+    return (filename, week_num, kickoff.isoformat(), len(filtered))
+
+# --- Main processing ---
+def main():
+    os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+    summary_rows = [("filename", "week", "kickoff_time", "entries_kept")]
+
+    with os.scandir(GAMES_FOLDER) as it:
+        filenames = [e.name for e in it if e.name.endswith(".json")]
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        summary_rows.extend(row for row in executor.map(process_file, filenames, chunksize=4) if row)
 
-    summary_rows.append((filename, week_num, kickoff.isoformat(), len(filtered)))
-    print(f"✅ Filtered {filename} → {out_path} ({len(filtered)} entries)")
+    # --- Write summary CSV ---
+    with open(SUMMARY_FILE, "w", newline="") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerows(summary_rows)
 
-# --- Write summary CSV ---
-with open(SUMMARY_FILE, "w", newline="") as csvfile:
-    writer = csv.writer(csvfile)
-    writer.writerows(summary_rows)
+    print(f"\nSummary written to {SUMMARY_FILE}")
 
-print(f"\nSummary written to {SUMMARY_FILE}")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import os
+import msgspec
+import numpy as np
+
+
+# --- Game file schema: a JSON list of these ---
+class Entry(msgspec.Struct):
+    time: str
+    price_cents: int | None
+
+
+# Schema compiled once, reused for every file
+entries_decoder = msgspec.json.Decoder(list[Entry])
+
+
+def json_to_arrays(json_path):
+    """Decode a game file into (times as datetime64[s], price_cents as float32 with NaN for missing)."""
+    with open(json_path, "rb") as f:
+        data = entries_decoder.decode(f.read())
+    times = np.array([e.time[:19] for e in data], dtype="datetime64[s]")
+    prices = np.array(
+        [e.price_cents if e.price_cents is not None else np.nan for e in data],
+        dtype=np.float32,
+    )
+    return times, prices
+
+
+def load_arrays(json_path):
+    """
+    Return (times, price_cents) for a game file, read from its .npz twin when
+    that is at least as new as the JSON, otherwise decoded from the JSON itself.
+    """
+    npz_path = json_path[:-len(".json")] + ".npz"
+    try:
+        if os.stat(npz_path).st_mtime >= os.stat(json_path).st_mtime:
+            with np.load(npz_path) as arrays:
+                return arrays["t"], arrays["p"]
+    except FileNotFoundError:
+        pass
+    return json_to_arrays(json_path)
@@ -1,7 +1,22 @@
 import requests
-import json
+import ijson
+import orjson
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from requests.adapters import HTTPAdapter
+
+# Month-day ticker prefixes from Sept 4th through December
+ALLOWED_PREFIXES = frozenset(
+    [f"SEP{d:02d}" for d in range(4, 31)]
+    + [f"{m}{d:02d}" for m in ("OCT", "NOV", "DEC") for d in range(1, 32)]
+)
+
+MAX_WORKERS = 20  # concurrent candlestick downloads, kept low for Kalshi's rate limits
+
+# One keep-alive session for every request, pooled for the worker threads
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=MAX_WORKERS))
 
 def create_games_folder():
     """Create games folder if it doesn't exist"""
@@ -19,7 +34,7 @@ def get_nfl_markets_after_date(cutoff_date):
         if cursor:
             url += f"&cursor={cursor}"
         
-        response = requests.get(url)
+        response = session.get(url)
         data = response.json()
         
         # Filter markets by date (check if ticker contains date >= Sept 4, 2025)
@@ -32,11 +47,7 @@ def get_nfl_markets_after_date(cutoff_date):
                 if len(date_part) >= 7:
                     month_day = date_part[2:7]  # Gets "SEP04" part
                     
-                    # Convert to comparable format
-                    if (month_day >= "SEP04" or 
-                        month_day.startswith("OCT") or 
-                        month_day.startswith("NOV") or 
-                        month_day.startswith("DEC")):
+                    if month_day in ALLOWED_PREFIXES:
                         all_markets.append(market)
         
         cursor = data.get('cursor')
@@ -48,12 +59,12 @@ def get_nfl_markets_after_date(cutoff_date):
     return all_markets
 
 def get_market_candlesticks(series_ticker, market_ticker, market_data):
-    """Get candlestick data for 8 hours before market close time"""
+    """Stream candlesticks for 8 hours before market close time, one at a time"""
     
     # Get market close time
     if 'close_time' not in market_data or not market_data['close_time']:
         print(f"No close_time found for {market_ticker}")
-        return {}
+        return
     
     # Parse close time (ISO format with Z)
     close_time_str = market_data['close_time']
@@ -75,21 +86,22 @@ def get_market_candlesticks(series_ticker, market_ticker, market_data):
         "period_interval": 1  # 1 minute intervals
     }
     
-    response = requests.get(url, params=params)
-    return response.json()
+    # Parse the body incrementally instead of holding the whole response in memory
+    with session.get(url, params=params, stream=True) as response:
+        response.raw.decode_content = True
+        yield from ijson.items(response.raw, "candlesticks.item", use_float=True)
 
-def extract_minute_prices(candlestick_data):
+def extract_minute_prices(candlesticks):
     """Extract just the minute-by-minute prices"""
     minute_prices = []
     
-    if 'candlesticks' in candlestick_data:
-        for candle in candlestick_data['candlesticks']:
-            time = datetime.fromtimestamp(candle['end_period_ts'])
-            close_price = candle['price']['close']
-            minute_prices.append({
-                'time': time.isoformat(),
-                'price_cents': close_price
-            })
+    for candle in candlesticks:
+        time = datetime.fromtimestamp(candle['end_period_ts'])
+        close_price = candle['price']['close']
+        minute_prices.append({
+            'time': time.isoformat(),
+            'price_cents': close_price
+        })
     
     return minute_prices
 
@@ -97,8 +109,8 @@ def save_minute_prices(market_ticker, minute_prices):
     """Save just the minute-by-minute prices to a file"""
     filename = f"games/{market_ticker}.json"
     
-    with open(filename, 'w') as f:
-        json.dump(minute_prices, f, indent=2)
+    with open(filename, 'wb') as f:
+        f.write(orjson.dumps(minute_prices, option=orjson.OPT_INDENT_2))
     
     print(f"Saved {len(minute_prices)} price points to: {filename}")
 
@@ -112,21 +124,25 @@ def main():
     nfl_markets = get_nfl_markets_after_date(cutoff_date)
     print(f"Found {len(nfl_markets)} NFL markets from Sept 4, 2025+")
     
-    for i, market in enumerate(nfl_markets):
+    def process_market(i, market):
         print(f"\nProcessing {i+1}/{len(nfl_markets)}: {market['ticker']}")
         print(f"Market close time: {market.get('close_time')}")
         
-        # Get candlestick data for 8 hours before close
-        candlestick_data = get_market_candlesticks("KXNFLGAME", market['ticker'], market)
+        # Stream candlestick data for 8 hours before close
+        candlesticks = get_market_candlesticks("KXNFLGAME", market['ticker'], market)
         
         # Extract just minute prices
-        minute_prices = extract_minute_prices(candlestick_data)
+        minute_prices = extract_minute_prices(candlesticks)
         
         if minute_prices:
             # Save to file
             save_minute_prices(market['ticker'], minute_prices)
         else:
             print(f"No price data found for {market['ticker']}")
+    
+    # Markets are independent, so overlap their round trips
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        list(executor.map(process_market, range(len(nfl_markets)), nfl_markets))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,12 +1,13 @@
 import websockets
 import shutil
 import asyncio
-import json
+import orjson
 import os
 import time
 import base64
 import requests
 from datetime import datetime
+from functools import lru_cache
 from dotenv import load_dotenv
 from cryptography.hazmat.primitives import hashes, serialization
 from cryptography.hazmat.primitives.asymmetric import padding
@@ -41,27 +42,22 @@ def ensure_active_games_folder():
     if not os.path.exists(ACTIVE_GAMES_FOLDER):
         os.makedirs(ACTIVE_GAMES_FOLDER)
 
+@lru_cache(maxsize=None)
 def parse_ticker_date(ticker: str):
     """
     Extract and parse the date from a ticker like 'KXNFLGAME-25OCT19ATLSF-SF'
     Returns a datetime.date object, or None if parsing fails.
+    Cached, since the same tickers come back on every market listing.
     """
+    # Split like ['KXNFLGAME', '25OCT19ATLSF-SF']
+    parts = ticker.split('-')
+    if len(parts) < 2:
+        return None
+    date_str = parts[1][:7]  # '25OCT19'
     try:
-        # Split like ['KXNFLGAME', '25OCT19ATLSF-SF']
-        parts = ticker.split('-')
-        if len(parts) < 2:
-            return None
-        date_str = parts[1][:7]  # '25OCT19'
-        date_obj = datetime.strptime(date_str, "%y%b%d").date()
-        return date_obj
-    except Exception:
-        # Handle tickers with slightly different formats just in case
-        try:
-            date_str = parts[1][:7].upper()
-            date_obj = datetime.strptime(date_str, "%y%b%d").date()
-            return date_obj
-        except Exception:
-            return None
+        return datetime.strptime(date_str, "%y%b%d").date()
+    except ValueError:
+        return None
 
 # --- Get Games Starting Today ---
 def get_todays_nfl_games():
@@ -110,54 +106,64 @@ async def monitor_active_nfl_games():
     last_data = {ticker: None for ticker in tickers}
     last_second = int(time.time())
 
-    while True:
-        try:
-            path = "/trade-api/ws/v2"
-            timestamp = str(int(time.time() * 1000))
-            signature = create_signature(private_key, timestamp, "GET", path)
-
-            async with websockets.connect(
-                WS_PROD_URL,
-                additional_headers=[
-                    ("KALSHI-ACCESS-KEY", ACCESS_KEY),
-                    ("KALSHI-ACCESS-SIGNATURE", signature),
-                    ("KALSHI-ACCESS-TIMESTAMP", timestamp)
-                ]
-            ) as ws:
-                subscribe_msg = {
-                    "id": 1,
-                    "cmd": "subscribe",
-                    "params": {"channels": ["ticker"], "market_tickers": tickers}
-                }
-                await ws.send(json.dumps(subscribe_msg))
-                print("✅ Connected! Streaming updates...")
-
-                async for message in ws:
-                    now_second = int(time.time())
-                    data = json.loads(message)
-
-                    if data.get("type") == "ticker":
-                        msg_data = data.get("msg", {})
-                        ticker = msg_data.get("market_ticker")
-                        if ticker in tickers:
-                            last_data[ticker] = msg_data
-
-                    # record one datapoint per second per ticker
-                    if now_second > last_second:
-                        for ticker in tickers:
-                            if last_data[ticker] is not None:
-                                filename = f"{ACTIVE_GAMES_FOLDER}/{ticker}.jsonl"
-                                last_data[ticker]['recorded_at'] = datetime.now().isoformat()
-                                with open(filename, "a") as f:
-                                    f.write(json.dumps(last_data[ticker]) + "\n")
-                        last_second = now_second
-
-        except websockets.exceptions.InvalidStatusCode as e:
-            print(f"❌ Connection failed with status {e.status_code}. Retrying in 10s...")
-            await asyncio.sleep(10)
-        except Exception as e:
-            print(f"⚠️ Connection error: {e}. Retrying in 10s...")
-            await asyncio.sleep(10)
+    # keep one handle per ticker open for the whole session; unbuffered, since
+    # simulate_live.py tails these files and needs each second's line right away
+    writers = {
+        t: open(f"{ACTIVE_GAMES_FOLDER}/{t}.jsonl", "ab", buffering=0)
+        for t in tickers
+    }
+
+    try:
+        while True:
+            try:
+                path = "/trade-api/ws/v2"
+                timestamp = str(int(time.time() * 1000))
+                signature = create_signature(private_key, timestamp, "GET", path)
+
+                async with websockets.connect(
+                    WS_PROD_URL,
+                    additional_headers=[
+                        ("KALSHI-ACCESS-KEY", ACCESS_KEY),
+                        ("KALSHI-ACCESS-SIGNATURE", signature),
+                        ("KALSHI-ACCESS-TIMESTAMP", timestamp)
+                    ]
+                ) as ws:
+                    subscribe_msg = {
+                        "id": 1,
+                        "cmd": "subscribe",
+                        "params": {"channels": ["ticker"], "market_tickers": tickers}
+                    }
+                    await ws.send(orjson.dumps(subscribe_msg).decode())
+                    print("✅ Connected! Streaming updates...")
+
+                    async for message in ws:
+                        now_second = int(time.time())
+                        data = orjson.loads(message)
+
+                        if data.get("type") == "ticker":
+                            msg_data = data.get("msg", {})
+                            ticker = msg_data.get("market_ticker")
+                            if ticker in tickers:
+                                last_data[ticker] = msg_data
+
+                        # record one datapoint per second per ticker
+                        if now_second > last_second:
+                            recorded_at = datetime.now().isoformat()  # same second for every ticker
+                            for ticker in tickers:
+                                if last_data[ticker] is not None:
+                                    last_data[ticker]['recorded_at'] = recorded_at
+                                    writers[ticker].write(orjson.dumps(last_data[ticker]) + b"\n")
+                            last_second = now_second
+
+            except websockets.exceptions.InvalidStatusCode as e:
+                print(f"❌ Connection failed with status {e.status_code}. Retrying in 10s...")
+                await asyncio.sleep(10)
+            except Exception as e:
+                print(f"⚠️ Connection error: {e}. Retrying in 10s...")
+                await asyncio.sleep(10)
+    finally:
+        for w in writers.values():
+            w.close()
 
 # --- Run the Monitor ---
 if __name__ == "__main__":
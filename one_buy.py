@@ -1,28 +1,126 @@
 import os
-import json
+from functools import lru_cache
+import numpy as np
+from game_data import load_arrays
+
+try:
+    from numba import njit, prange, set_num_threads
+except ImportError:
+    # No Numba (e.g. under PyPy): the kernels run as plain Python, which
+    # PyPy's own JIT compiles. super_checker_full imports these from here too.
+    prange = range
+
+    def njit(*args, **kwargs):
+        """Stand-in for numba.njit that returns the function unchanged."""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+    def set_num_threads(n):
+        pass
 
 # --- Default strategy parameters ---
 START_BANKROLL = 20.0
 FLAT_BET_AMOUNT = 2.0  # Flat $2 bet per game
 FILTER_FOLDER = "filter"
 
+# fastmath without "nnan": NaN marks a missing price and must stay observable,
+# and without "contract"/"reassoc": fusing or reordering the EMA update moves
+# it across the exact-cent sell thresholds, changing which ticks trigger a sell
+FASTMATH_FLAGS = {"nsz", "arcp", "afn"}
 
-def incremental_ema_smooth(alpha=0.25):
+
+@njit(cache=True, fastmath=FASTMATH_FLAGS)
+def _simulate_kernel(prices, min_start, max_start, gain_threshold, halftime_fraction, fall_fraction, alpha):
     """
-    Returns a function to incrementally smooth incoming points using an EMA.
-    Causal and low-lag. alpha controls responsiveness (0 < alpha <= 1).
+    Run the EMA + sell logic over one position's prices (NaN = missing).
+    Returns (sell_price, start_price); sell_price is NaN when no bet is placed.
     """
-    last = None
+    n = prices.shape[0]
+
+    # The EMA's first output is the first valid price itself, so the entry
+    # range can be checked before any smoothing work is done.
+    first = 0
+    while first < n and np.isnan(prices[first]):
+        first += 1
+    if first == n:
+        return np.nan, np.nan
+    start_price = prices[first]
+    if not (min_start <= start_price <= max_start):
+        return np.nan, start_price
+
+    ema = start_price
+    last_price = start_price
+    max_gain = 0.0
+    halftime_index = int(n * halftime_fraction)
+    for i in range(first, n):
+        real_price = prices[i]
+        if np.isnan(real_price):
+            continue
+        if i > first:
+            # kept in this form on purpose: ema + alpha * (x - ema) rounds
+            # differently and flips some exact-cent sell decisions
+            ema = alpha * real_price + (1 - alpha) * ema
+        last_price = real_price
+
+        gain = ema - start_price
+        max_gain = max(max_gain, gain)
+
+        # --- Sell conditions based on EMA-smoothed data ---
+        if max_gain >= gain_threshold and gain < gain_threshold:
+            return real_price, start_price
+        if max_gain > gain_threshold and gain <= max_gain * fall_fraction:
+            return real_price, start_price
+        if i == halftime_index and ema < start_price + gain_threshold:
+            return real_price, start_price
+
+    return last_price, start_price
+
+
+# compile (or load from cache) once at import rather than on the first game
+_simulate_kernel(np.zeros(2), 0.0, 1.0, 0.03, 1.0, 0.81, 0.25)
+
+
+def get_game_pairs(paths):
+    games = {}
+    for path in paths:
+        parts = os.path.basename(path).rsplit("-", 1)
+        game_key = parts[0]
+        games.setdefault(game_key, []).append(path)
+    return {k: v for k, v in games.items() if len(v) == 2}
+
 
-    def smooth_next(new_point):
-        nonlocal last
-        if last is None:
-            last = new_point
-        else:
-            last = alpha * new_point + (1 - alpha) * last
-        return last
+def list_weeks(folder):
+    """Return [(week_name, [json paths]), ...] for every week folder, in name order."""
+    with os.scandir(folder) as it:
+        week_dirs = sorted((e for e in it if e.is_dir()), key=lambda e: e.name)
+    weeks = []
+    for week in week_dirs:
+        with os.scandir(week.path) as it:
+            weeks.append((week.name, [e.path for e in it if e.name.endswith(".json")]))
+    return weeks
 
-    return smooth_next
+
+@lru_cache(maxsize=None)
+def _load_prices(path):
+    """Load one game file into a float64 price array (0-1, NaN = missing)."""
+    _, price_cents = load_arrays(path)
+    return price_cents.astype(np.float64) / 100
+
+
+@lru_cache(maxsize=None)
+def load_games(folder=FILTER_FOLDER):
+    """
+    Load the filtered weeks once and return [(week_name, game_key, [prices, prices]), ...].
+    Cached so parameter sweeps calling run_simulation repeatedly skip all JSON decoding.
+    """
+    games = []
+    for week_name, week_paths in list_weeks(folder):
+        game_pairs = get_game_pairs(week_paths)
+        for game_key, paths in game_pairs.items():
+            positions = [_load_prices(path) for path in paths]
+            games.append((week_name, game_key, positions))
+    return games
 
 
 def run_simulation(
@@ -35,80 +133,22 @@ def run_simulation(
 ):
     bankroll = START_BANKROLL
 
-    def get_game_pairs(folder):
-        files = [f for f in os.listdir(folder) if f.endswith(".json")]
-        games = {}
-        for f in files:
-            parts = f.rsplit("-", 1)
-            game_key = parts[0]
-            games.setdefault(game_key, []).append(f)
-        return {k: v for k, v in games.items() if len(v) == 2}
-
-    def simulate_position(data):
-        prices = [e["price_cents"] / 100 if e["price_cents"] is not None else None for e in data]
-        valid_prices = [p for p in prices if p is not None]
-        if not valid_prices:
-            return 0.0
-
-        # --- incremental EMA smoothing ---
-        smoother = incremental_ema_smooth(alpha=ema_alpha)
-        smoothed_full = []
-        for p in prices:
-            if p is None:
-                smoothed_full.append(None)
-            else:
-                smoothed_full.append(smoother(p))
-
-        start_price = next((p for p in smoothed_full if p is not None), None)
-        if start_price is None or not (min_start <= start_price <= max_start):
+    def simulate_position(prices):
+        sell_price, start_price = _simulate_kernel(
+            prices, min_start, max_start, gain_threshold, halftime_fraction, fall_fraction, ema_alpha
+        )
+        if np.isnan(sell_price):
             return 0.0
 
         stake = FLAT_BET_AMOUNT
-        max_gain = 0
-        sell_price = None
-        halftime_index = int(len(smoothed_full) * halftime_fraction)
-
-        for idx, smooth_price in enumerate(smoothed_full):
-            if smooth_price is None:
-                continue
-            real_price = prices[idx]
-            if real_price is None:
-                continue
-
-            gain = smooth_price - start_price
-            max_gain = max(max_gain, gain)
-
-            # --- Sell conditions based on EMA-smoothed data ---
-            if max_gain >= gain_threshold and gain < gain_threshold:
-                sell_price = real_price
-                break
-            if max_gain > gain_threshold and gain <= max_gain * fall_fraction:
-                sell_price = real_price
-                break
-            if idx == halftime_index and smooth_price < start_price + gain_threshold:
-                sell_price = real_price
-                break
-
-        if sell_price is None:
-            sell_price = next((p for p in reversed(prices) if p is not None), start_price)
-
         return stake * ((sell_price / start_price) - 1)
 
     # --- Process all weeks and games ---
-    for week_name in sorted(os.listdir(FILTER_FOLDER)):
-        week_path = os.path.join(FILTER_FOLDER, week_name)
-        if not os.path.isdir(week_path):
-            continue
-
-        game_pairs = get_game_pairs(week_path)
-        for game_key, files in game_pairs.items():
-            game_profit = 0
-            for f in files:
-                file_path = os.path.join(week_path, f)
-                with open(file_path, "r") as json_file:
-                    data = json.load(json_file)
-                game_profit += simulate_position(data)
-            bankroll += game_profit
+    for week_name, game_key, positions in load_games(FILTER_FOLDER):
+        game_profit = 0
+        for prices in positions:
+            game_profit += simulate_position(prices)
+        bankroll += game_profit
 
     return bankroll
 
@@ -1,56 +1,160 @@
 import os
-import json
-import time
-from collections import deque
-from typing import Optional
+import asyncio
+from dataclasses import dataclass, field, fields
+from typing import Final, Optional
+import numpy as np
+import orjson
 from rich.console import Console
+from rich.live import Live
 from rich.table import Table
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
 
 # ---------- CONFIG ----------
-ACTIVE_FOLDER = "active_games"     # folder containing ticker.jsonl files
-BET_AMOUNT = 10.0                  # flat $10 bet per game
-MIN_START = 0.14
-MAX_START = 0.77
-GAIN_THRESHOLD = 0.03
-FALL_FRACTION = 0.81
-SIGMA_REF = 3.32                   # original reference sigma (per minute)
-SAMPLES_PER_MINUTE = 60.0          # we sample every second, so 60 samples/min
-DISPLAY_INTERVAL = 10              # seconds between dashboard refresh (also immediate on sell)
-HISTORY_LENGTH = 300               # keep last N raw prices if you want history (not required for EWMA)
+ACTIVE_FOLDER: Final = "active_games"     # folder containing ticker.jsonl files
+BET_AMOUNT: Final = 10.0                  # flat $10 bet per game
+MIN_START: Final = 0.14
+MAX_START: Final = 0.77
+GAIN_THRESHOLD: Final = 0.03
+FALL_FRACTION: Final = 0.81
+SIGMA_REF: Final = 3.32                   # original reference sigma (per minute)
+SAMPLES_PER_MINUTE: Final = 60.0          # we sample every second, so 60 samples/min
+DISPLAY_INTERVAL: Final = 10              # seconds between dashboard refresh (also immediate on sell)
+HISTORY_LENGTH: Final = 300               # keep last N raw prices if you want history (not required for EWMA)
+STATE_CAPACITY: Final = 64                # initial ticker slots in State; doubled whenever they run out
 
 # ---------- STATE ----------
+def _column(fill, dtype=np.float64):
+    return field(default_factory=lambda: np.full(STATE_CAPACITY, fill, dtype=dtype))
+
+@dataclass(slots=True)
+class State:
+    """Per-ticker live state as parallel arrays; row i belongs to tickers[i]."""
+    tickers: list[str] = field(default_factory=list)
+    index: dict[str, int] = field(default_factory=dict)  # ticker -> row
+    smoothed: np.ndarray = _column(np.nan)               # current EWMA smoothed price
+    start: np.ndarray = _column(0.0)                     # start price of the bet
+    max_gain: np.ndarray = _column(0.0)
+    bet: np.ndarray = _column(0.0)                       # stake placed
+    active: np.ndarray = _column(False, bool)            # bet placed and not yet sold
+    sold: np.ndarray = _column(False, bool)
+    profit: np.ndarray = _column(0.0)                    # realized profit once sold
+
+    def add(self, ticker: str) -> int:
+        """Give ticker the next row, growing the arrays when they are full."""
+        i = len(self.tickers)
+        if i == len(self.smoothed):
+            for f in fields(self):
+                old = getattr(self, f.name)
+                if isinstance(old, np.ndarray):
+                    fill = np.nan if f.name == "smoothed" else 0
+                    setattr(self, f.name, np.concatenate((old, np.full_like(old, fill))))
+        self.tickers.append(ticker)
+        self.index[ticker] = i
+        return i
+
 console = Console()
-smoothed = {}         # ticker -> current EWMA smoothed price (float)
-price_history = {}    # ticker -> deque of raw prices (optional, for debugging)
-active_bets = {}      # ticker -> {"bet": float, "start_price": float, "max_gain": float}
-sold_games = {}       # ticker -> realized profit (float)
+state = State()       # every ticker that has had a price
+price_history = {}    # ticker -> (float32 ring buffer, [prices written]) of raw prices (optional, for debugging)
 bankroll = 0.0        # starts at 0, only increases on sells
 
+# ---------- DASHBOARD STATE ----------
+_table: Optional[Table] = None   # table currently shown by the Live display
+_ordered_tickers: list[str] = [] # sorted tickers; list index = row in _table
+_tickers_dirty = True            # set when a ticker is added to state
+
+# ---------- TAIL STATE ----------
+_tail_state: dict[str, tuple[int, int, Optional[float]]] = {}  # path -> (inode, bytes parsed, last price)
+
 # ---------- HELPERS ----------
-def load_last_price_from_jsonl(path: str) -> Optional[float]:
-    """Return last valid 'price' (0-1) from a JSONL file, or None."""
-    if not os.path.exists(path):
+def _resume_offset(path: str, st: os.stat_result) -> tuple[int, Optional[float]]:
+    """(offset, last price) to resume tailing from; a replaced or truncated file starts over."""
+    inode, offset, last_price = _tail_state.get(path, (None, 0, None))
+    if inode != st.st_ino or st.st_size < offset:
+        return 0, None
+    return offset, last_price
+
+def _line_price(line: bytes) -> Optional[float]:
+    """Price (0-1) from one JSONL line, or None if it is not an object with a numeric 'price'."""
+    try:
+        obj = orjson.loads(line)
+    except orjson.JSONDecodeError:
+        return None
+    p = obj.get("price") if isinstance(obj, dict) else None
+    if isinstance(p, bool) or not isinstance(p, (int, float)):
+        return None
+    return p / 100.0  # convert cents -> 0..1
+
+def _last_price_before(data: bytes, end: int) -> Optional[float]:
+    """
+    Newest price in the complete lines of data[:end], where end is a newline.
+    Lines are scanned backward and the scan stops at the first one with a price,
+    so even a cold start on a long file usually decodes a single line.
+    """
+    while end > 0:
+        line_start = data.rfind(b"\n", 0, end) + 1
+        price = _line_price(data[line_start:end])
+        if price is not None:
+            return price
+        end = line_start - 1
+    return None
+
+def _read_new_lines(path: str, st: os.stat_result, offset: int, last_price: Optional[float]) -> Optional[float]:
+    """
+    Find the newest price in the complete lines between offset and EOF and
+    record the new tail state. Returns None if those lines hold no price.
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    # only complete lines are parsed; a partial last line is re-read next time
+    end = data.rfind(b"\n")
+    if end < 0:
+        _tail_state[path] = (st.st_ino, offset, last_price)
         return None
-    last_price = None
+
+    newest = _last_price_before(data, end)
+    _tail_state[path] = (st.st_ino, offset + end + 1, newest if newest is not None else last_price)
+    return newest
+
+def _newest_price(path: str, keep_last: bool) -> Optional[float]:
+    """
+    Newest 'price' (0-1) appended to a JSONL file since the previous call. When
+    nothing new arrived, returns the last price seen if keep_last, else None.
+    A replaced or truncated file is re-read from the start.
+    """
     try:
-        with open(path, "r") as f:
-            for line in f:
-                try:
-                    obj = json.loads(line)
-                    p = obj.get("price")
-                    if p is not None:
-                        last_price = p / 100.0  # convert cents -> 0..1
-                except json.JSONDecodeError:
-                    continue
+        st = os.stat(path)
+    except OSError:
+        _tail_state.pop(path, None)
+        return None
+
+    offset, last_price = _resume_offset(path, st)
+    unchanged = last_price if keep_last else None
+    if st.st_size == offset:
+        _tail_state[path] = (st.st_ino, offset, last_price)
+        return unchanged
+
+    try:
+        newest = _read_new_lines(path, st, offset, last_price)
     except Exception:
+        # a bad read skips this tick; the tail keeps running
         return None
-    return last_price
+    return newest if newest is not None else unchanged
+
+def load_last_price_from_jsonl(path: str) -> Optional[float]:
+    """Return last valid 'price' (0-1) from a JSONL file, or None."""
+    return _newest_price(path, keep_last=True)
+
+def read_new_price(path: str) -> Optional[float]:
+    """Return the newest 'price' (0-1) appended to a JSONL file since the last read, or None."""
+    return _newest_price(path, keep_last=False)
 
 def ewma_update(prev: Optional[float], value: float, alpha: float) -> float:
     """One-step EWMA update (causal). If prev is None, return value."""
     if prev is None:
-        return float(value)
-    return alpha * float(value) + (1.0 - alpha) * float(prev)
+        return value
+    return prev + alpha * (value - prev)
 
 def compute_alpha_from_sigma_minutes(sigma_minutes: float) -> float:
     """
@@ -65,7 +169,27 @@ def compute_alpha_from_sigma_minutes(sigma_minutes: float) -> float:
     alpha = max(0.001, min(alpha, 0.5))
     return alpha
 
-ALPHA = compute_alpha_from_sigma_minutes(SIGMA_REF)  # small number, very smooth
+ALPHA: Final = compute_alpha_from_sigma_minutes(SIGMA_REF)  # small number, very smooth
+
+def record_price(ticker: str, price: float):
+    """Write price into the ticker's HISTORY_LENGTH-slot ring buffer in price_history."""
+    entry = price_history.get(ticker)
+    if entry is None:
+        # allocated only for a new ticker; setdefault would build the buffer every tick
+        entry = price_history[ticker] = (np.empty(HISTORY_LENGTH, dtype=np.float32), [0])
+    buf, written = entry
+    buf[written[0] % HISTORY_LENGTH] = price
+    written[0] += 1
+
+def recent_prices(ticker: str) -> np.ndarray:
+    """The ticker's last (up to) HISTORY_LENGTH raw prices, oldest first."""
+    if ticker not in price_history:
+        return np.empty(0, dtype=np.float32)
+    buf, written = price_history[ticker]
+    if written[0] < HISTORY_LENGTH:
+        return buf[:written[0]].copy()
+    i = written[0] % HISTORY_LENGTH
+    return np.concatenate((buf[i:], buf[:i]))
 # ---------- END HELPERS ----------
 
 def place_initial_bets():
@@ -84,78 +208,53 @@ def place_initial_bets():
         if last_price is None:
             continue
         # initialize smoothed and history
-        smoothed[ticker] = last_price
-        price_history.setdefault(ticker, deque(maxlen=HISTORY_LENGTH)).append(last_price)
+        i = state.add(ticker)
+        state.smoothed[i] = last_price
+        record_price(ticker, last_price)
 
     # place bets where smoothed price falls in range
-    for ticker, s_price in list(smoothed.items()):
-        if MIN_START <= s_price <= MAX_START:
-            active_bets[ticker] = {"bet": BET_AMOUNT, "start_price": s_price, "max_gain": 0.0}
-            console.print(f"💵 Placed ${BET_AMOUNT:.2f} bet on {ticker} at start price {s_price:.3f}")
-
-def update_from_live_files() -> list:
-    """
-    Read the latest price for each ticker, update EWMA smoothed[ticker].
-    Returns a list of tickers that were updated (have a new or existing smoothed value).
-    """
-    updated_tickers = []
-    for fn in os.listdir(ACTIVE_FOLDER):
-        if not fn.endswith(".jsonl"):
-            continue
-        ticker = fn[:-6]
-        path = os.path.join(ACTIVE_FOLDER, fn)
-        last_price = load_last_price_from_jsonl(path)
-        if last_price is None:
-            continue
+    n = len(state.tickers)
+    s_price = state.smoothed[:n]
+    place = (MIN_START <= s_price) & (s_price <= MAX_START)
+    state.active[:n] = place
+    state.start[:n][place] = s_price[place]
+    state.bet[:n][place] = BET_AMOUNT
+    for i in np.flatnonzero(place):
+        console.print(f"💵 Placed ${BET_AMOUNT:.2f} bet on {state.tickers[i]} at start price {s_price[i]:.3f}")
 
-        # initialize structures if missing
-        if ticker not in smoothed:
-            smoothed[ticker] = last_price
-        else:
-            smoothed[ticker] = ewma_update(smoothed[ticker], last_price, ALPHA)
-
-        price_history.setdefault(ticker, deque(maxlen=HISTORY_LENGTH)).append(last_price)
-        updated_tickers.append(ticker)
-    return updated_tickers
-
-def evaluate_sells_for_ticker(ticker: str) -> bool:
+def evaluate_sells(gain_threshold: float = GAIN_THRESHOLD, fall_fraction: float = FALL_FRACTION) -> bool:
     """
-    Update max_gain for active bet and evaluate sell conditions.
-    If sell occurs, update bankroll and return True. Otherwise False.
+    Update max_gain of every active bet and evaluate sell conditions for all of them at once.
+    Sold bets update bankroll; returns True if any sold. The thresholds are bound as
+    defaults so the per-tick call reads them as locals.
     """
     global bankroll
-    if ticker not in active_bets:
-        return False
-    if ticker not in smoothed:
-        return False
+    tickers, bet, profit, sold = state.tickers, state.bet, state.profit, state.sold
+    n = len(tickers)
+    active = state.active[:n]
+    current = state.smoothed[:n]
+    max_gain = state.max_gain[:n]
 
-    current = smoothed[ticker]
-    bet = active_bets[ticker]
-    start = bet["start_price"]
-
-    gain = current - start
-    if gain > bet["max_gain"]:
-        bet["max_gain"] = gain
+    gain = current - state.start[:n]
+    np.maximum(max_gain, gain, out=max_gain, where=active)
 
     # sell conditions (based on relative gains)
-    sell = False
-    if bet["max_gain"] >= GAIN_THRESHOLD and gain < GAIN_THRESHOLD:
-        sell = True
-    elif bet["max_gain"] > GAIN_THRESHOLD and gain <= bet["max_gain"] * FALL_FRACTION:
-        sell = True
+    sell = active & (
+        ((max_gain >= gain_threshold) & (gain < gain_threshold))
+        | ((max_gain > gain_threshold) & (gain <= max_gain * fall_fraction))
+    )
 
-    if sell:
+    for i in np.flatnonzero(sell):
         # realized profit for binary-style price: bet * (p - start)
-        profit = bet["bet"] * (current - start)
-        bankroll += profit
-        sold_games[ticker] = profit
-        del active_bets[ticker]
-        console.print(f"💰 SOLD {ticker} at {current:.3f} -> Profit: ${profit:.2f}", style="bold green")
-        return True
-    return False
-
-def build_and_print_dashboard():
-    """Show a clean dashboard; max_gain shown as decimal, P/L as dollars."""
+        realized = bet[i] * gain[i]
+        bankroll += realized
+        profit[i] = realized
+        sold[i] = True
+        active[i] = False
+        console.print(f"💰 SOLD {tickers[i]} at {current[i]:.3f} -> Profit: ${realized:.2f}", style="bold green")
+    return bool(sell.any())
+
+def _new_dashboard_table() -> Table:
     table = Table(title="Active Game Dashboard (smoothed prices)")
     table.add_column("Ticker", style="cyan", no_wrap=True)
     table.add_column("Current", justify="right")
@@ -163,53 +262,149 @@ def build_and_print_dashboard():
     table.add_column("Position", justify="right")
     table.add_column("Unrealized P/L", justify="right")
     table.add_column("Realized P/L", justify="right")
+    return table
 
-    # iterate sorted for stable display
-    tickers = sorted(smoothed.keys())
-    for ticker in tickers:
-        cur = smoothed.get(ticker)
-        cur_str = f"{cur:.3f}" if cur is not None else "-"
-        if ticker in active_bets:
-            bet = active_bets[ticker]
-            max_gain = bet.get("max_gain", 0.0)
-            unrealized = bet["bet"] * (cur - bet["start_price"])
-            pos = f"${bet['bet']:.2f}"
+def _dashboard_rows():
+    """Yield the display row of every ticker in _ordered_tickers."""
+    index, smoothed, start, max_gain = state.index, state.smoothed, state.start, state.max_gain
+    bet, active, sold, profit = state.bet, state.active, state.sold, state.profit
+    for ticker in _ordered_tickers:
+        i = index[ticker]
+        cur = smoothed[i]
+        cur_str = f"{cur:.3f}"
+        if active[i]:
+            unrealized = bet[i] * (cur - start[i])
+            pos = f"${bet[i]:.2f}"
             unreal_str = f"${unrealized:.2f}"
-            maxgain_str = f"{max_gain:.3f}"
+            maxgain_str = f"{max_gain[i]:.3f}"
         else:
             pos = "-"
             unreal_str = "-"
-            maxgain_str = "-" if ticker not in sold_games else "-"
-        realized = f"${sold_games.get(ticker, 0.0):.2f}" if ticker in sold_games else "-"
+            maxgain_str = "-"
+        realized = f"${profit[i]:.2f}" if sold[i] else "-"
+        yield ticker, cur_str, maxgain_str, pos, unreal_str, realized
 
-        table.add_row(ticker, cur_str, maxgain_str, pos, unreal_str, realized)
+def build_and_print_dashboard(live: Live):
+    """
+    Refresh the live dashboard; max_gain shown as decimal, P/L as dollars.
+    Cells are rewritten in place; the table is only rebuilt when a ticker appears.
+    """
+    global _table, _tickers_dirty
+    if _tickers_dirty:
+        # iterate sorted for stable display
+        _ordered_tickers[:] = sorted(state.tickers)
+        _tickers_dirty = False
+        _table = _new_dashboard_table()
+        for values in _dashboard_rows():
+            _table.add_row(*values)
+        live.update(_table)
+    else:
+        columns = _table.columns
+        for row, values in enumerate(_dashboard_rows()):
+            for column, value in zip(columns, values):
+                column._cells[row] = value
+    _table.caption = f"💰 Total bankroll (realized only): ${bankroll:.2f}"
 
-    console.clear()
-    console.print(table)
-    console.print(f"💰 Total bankroll (realized only): ${bankroll:.2f}", style="bold magenta")
+# ---------- CHANGE EVENTS ----------
+_wakeups: dict[str, asyncio.Event] = {}  # path -> set when the file has new bytes to read
+_tails: dict[str, asyncio.Task] = {}     # path -> task running tail() for it
+_redraw = asyncio.Event()                # set to redraw the dashboard right away
 
-# ---------- MAIN ----------
-def main_loop():
-    # 1) place initial bets (once) using the latest available smoothed price
-    place_initial_bets()
+class JsonlChangeHandler(FileSystemEventHandler):
+    """Wake the tail of every .jsonl file created or modified in ACTIVE_FOLDER."""
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
 
-    last_display = 0.0
+    def on_created(self, event):
+        self._push(event)
+
+    def on_modified(self, event):
+        self._push(event)
+
+    def _push(self, event):
+        if not event.is_directory and event.src_path.endswith(".jsonl"):
+            # watchdog runs handlers on its own thread
+            self.loop.call_soon_threadsafe(notify_changed, event.src_path)
+
+def notify_changed(path: str):
+    wakeup = _wakeups.get(path)
+    if wakeup is None:
+        start_tail(path)
+    else:
+        wakeup.set()
+
+def start_tail(path: str, has_new_data: bool = True):
+    wakeup = _wakeups[path] = asyncio.Event()
+    if has_new_data:
+        wakeup.set()
+    task = _tails[path] = asyncio.create_task(tail(os.path.basename(path)[:-6], path, wakeup), name=path)
+    task.add_done_callback(_tail_done)
+
+def _tail_done(task: asyncio.Task):
+    """Report a tail that died and forget it, so the file's next write starts a new one."""
+    if task.cancelled():
+        return
+    path = task.get_name()
+    _wakeups.pop(path, None)
+    _tails.pop(path, None)
+    console.print(f"⚠️ Stopped tailing {path}: {task.exception()!r}", style="bold red")
+
+async def tail(ticker: str, path: str, wakeup: asyncio.Event, alpha: float = ALPHA):
+    """Apply each batch of new prices written to path: update the EWMA, then evaluate sells."""
+    global _tickers_dirty
     while True:
-        updated = update_from_live_files()  # refresh smoothed values using EWMA
+        await wakeup.wait()
+        wakeup.clear()  # cleared before the read so a write during it wakes us again
+        last_price = read_new_price(path)
+        if last_price is None:
+            continue
 
-        # Evaluate sells for any tickers that have active bets (every second)
-        sell_happened = False
-        for ticker in list(active_bets.keys()):
-            if evaluate_sells_for_ticker(ticker):
-                sell_happened = True
+        # initialize structures if missing
+        i = state.index.get(ticker)
+        if i is None:
+            i = state.add(ticker)
+            state.smoothed[i] = last_price
+            _tickers_dirty = True
+        else:
+            smoothed = state.smoothed
+            smoothed[i] = ewma_update(smoothed[i], last_price, alpha)
+
+        record_price(ticker, last_price)
+        if evaluate_sells():
+            _redraw.set()
+
+async def dashboard():
+    """Update the table every DISPLAY_INTERVAL seconds, or immediately after a sell."""
+    with Live(console=console, refresh_per_second=2) as live:
+        while True:
+            build_and_print_dashboard(live)
+            try:
+                await asyncio.wait_for(_redraw.wait(), DISPLAY_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            _redraw.clear()
+
+# ---------- MAIN ----------
+async def main_loop():
+    # watch for writes before the initial read so none are missed in between
+    observer = Observer()
+    observer.schedule(JsonlChangeHandler(asyncio.get_running_loop()), ACTIVE_FOLDER, recursive=False)
+    observer.start()
+
+    try:
+        # 1) place initial bets (once) using the latest available smoothed price
+        place_initial_bets()
 
-        # dashboard refresh: immediate on sell or at DISPLAY_INTERVAL
-        now = time.time()
-        if sell_happened or (now - last_display) >= DISPLAY_INTERVAL:
-            build_and_print_dashboard()
-            last_display = now
+        # 2) tail every file; the ones just read wait for their next write
+        for fn in os.listdir(ACTIVE_FOLDER):
+            if fn.endswith(".jsonl"):
+                start_tail(os.path.join(ACTIVE_FOLDER, fn), has_new_data=False)
 
-        time.sleep(1.0)
+        # tails run as their own tasks; _tail_done reports any that fail
+        await dashboard()
+    finally:
+        observer.stop()
+        observer.join()
 
 if __name__ == "__main__":
     if not os.path.isdir(ACTIVE_FOLDER):
@@ -217,6 +412,6 @@ if __name__ == "__main__":
     else:
         console.print(f"Alpha (EWMA) = {ALPHA:.6f}  |  SIGMA_REF={SIGMA_REF}min -> EWMA alpha computed", style="dim")
         try:
-            main_loop()
+            asyncio.run(main_loop())
         except KeyboardInterrupt:
             console.print("Exiting (keyboard interrupt).", style="bold yellow")
\ No newline at end of file
@@ -2,9 +2,10 @@ import os
 import csv
 import time
 import numpy as np
-from itertools import product
-from multiprocessing import Pool, cpu_count
-from one_buy import run_simulation  # Make sure this uses EMA internally
+from multiprocessing import Pool, cpu_count, shared_memory
+from one_buy import (
+    FASTMATH_FLAGS, FILTER_FOLDER, FLAT_BET_AMOUNT, START_BANKROLL, load_games, njit, prange, set_num_threads,
+)
 
 # --- Parameter ranges: (start, stop, step) ---
 MIN_START_RANGE = (0.14, 0.15, 0.01)
@@ -14,83 +15,307 @@ FALL_FRACTION_RANGE = (0.79, 0.81, 0.01)
 ALPHA_RANGE = (0.2, 0.4, 0.01)  # EMA smoothing factor
 HALFTIME_FRACTION = 1.0  # Fixed
 
-# --- Generate all combinations ---
-min_starts = np.arange(*MIN_START_RANGE)
-max_starts = np.arange(*MAX_START_RANGE)
-gain_thresholds = np.arange(*GAIN_THRESHOLD_RANGE)
-fall_fractions = np.arange(*FALL_FRACTION_RANGE)
-alphas = np.arange(*ALPHA_RANGE)
-
-param_combos = [
-    (min_start, max_start, gain_th, fall_frac, alpha)
-    for min_start, max_start, gain_th, fall_frac, alpha in product(
-        min_starts, max_starts, gain_thresholds, fall_fractions, alphas
-    )
-    if max_start > min_start  # ensure valid range
-]
-
-total_combos = len(param_combos)
-print(f"🧮 Total parameter combinations: {total_combos}")
-
-# --- Worker for a batch ---
-def run_batch(batch):
-    results = []
-    for min_start, max_start, gain_th, fall_frac, alpha in batch:
-        bankroll = run_simulation(
-            min_start=min_start,
-            max_start=max_start,
-            gain_threshold=gain_th,
-            fall_fraction=fall_frac,
-            ema_alpha=alpha,         # Pass EMA alpha to simulation
-            halftime_fraction=HALFTIME_FRACTION
-        )
-        results.append((
-            round(min_start, 3),
-            round(max_start, 3),
-            round(gain_th, 3),
-            round(fall_frac, 3),
-            round(alpha, 3),
-            round(bankroll, 2)
-        ))
-    return results
-
-# --- Split work into chunks ---
-num_cores = max(1, cpu_count() - 1)
-chunk_size = int(np.ceil(total_combos / num_cores))
-chunks = [param_combos[i:i + chunk_size] for i in range(0, total_combos, chunk_size)]
-print(f"⚙️ Using {num_cores} CPU cores (~{chunk_size} combos per core)")
-
-# --- Run parameter sweep ---
-start_time = time.time()
-all_results = []
-completed = 0
-os.makedirs("sweeps", exist_ok=True)
-
-with Pool(num_cores) as pool:
-    for batch_result in pool.imap_unordered(run_batch, chunks):
-        all_results.extend(batch_result)
-        completed += len(batch_result)
-        if completed % 50 == 0 or completed == total_combos:
-            elapsed = time.time() - start_time
-            best_so_far = max(all_results, key=lambda r: r[-1])
-            progress = min(100, completed / total_combos * 100)
-            print(f"Progress: {progress:.2f}% | Completed: {completed}/{total_combos} | "
-                  f"Best bankroll so far: ${best_so_far[-1]:.2f} | Elapsed: {elapsed/60:.1f} min")
-
-# --- Save CSV ---
-csv_path = os.path.join("sweeps", "sweep_ema_results.csv")
-with open(csv_path, "w", newline="") as f:
-    writer = csv.writer(f)
-    writer.writerow(["MIN_START","MAX_START","GAIN_THRESHOLD","FALL_FRACTION","ALPHA","FINAL_BANKROLL"])
-    writer.writerows(all_results)
-
-# --- Best result ---
-best = max(all_results, key=lambda r: r[-1])
-print("\n🏆 Best parameters found:")
-print(f"MIN_START: {best[0]}")
-print(f"MAX_START: {best[1]}")
-print(f"GAIN_THRESHOLD: {best[2]}")
-print(f"FALL_FRACTION: {best[3]}")
-print(f"EMA ALPHA: {best[4]}")
-print(f"Best bankroll: ${best[5]:.2f}")
-print(f"Results saved to {csv_path}")
+# Grids up to this size run as one multithreaded sweep call; larger ones are
+# split across a process pool so progress can be reported along the way.
+MAX_IN_PROCESS_COMBOS = 1_000_000
+
+# Pool work is handed out in small row ranges so idle workers keep picking up
+# more; TASKS_PER_DISPATCH ranges travel per IPC round trip.
+COMBOS_PER_TASK = 64
+TASKS_PER_DISPATCH = 4
+PROGRESS_INTERVAL = 5.0  # seconds between progress lines
+CSV_SLICE_ROWS = 65_536  # result rows turned into Python lists per writerows call
+
+# "numba" runs the compiled per-tick kernel (plain Python when Numba is not
+# installed, e.g. under PyPy); "numpy" runs the array-at-a-time sell detector
+# in sweep_numpy (slower, but needs no JIT compilation).
+SWEEP_BACKEND = "numba"
+
+
+# --- Price matrix: every position NaN-padded into one array ---
+def build_price_matrix(folder=FILTER_FOLDER):
+    """
+    Stack every game's positions into one NaN-padded float64 matrix.
+    Returns (prices, lengths, offsets): row r holds lengths[r] real ticks and
+    game g owns rows offsets[g]:offsets[g + 1].
+    """
+    games = load_games(folder)
+    rows = [prices for _, _, positions in games for prices in positions]
+    lengths = np.array([len(r) for r in rows], dtype=np.int64)
+    prices = np.full((len(rows), lengths.max(initial=0)), np.nan)
+    for i, r in enumerate(rows):
+        prices[i, :len(r)] = r
+    offsets = np.cumsum([0] + [len(positions) for _, _, positions in games], dtype=np.int64)
+    return prices, lengths, offsets
+
+
+def compact_rows(prices):
+    """
+    Left-align the valid (non-NaN) ticks of every row, zero-padded.
+    Returns (values, positions, counts): row r's counts[r] valid prices are
+    values[r, :counts[r]] and positions[r, j] is the tick values[r, j] came from.
+    """
+    valid = ~np.isnan(prices)
+    counts = valid.sum(axis=1)
+    values = np.zeros((len(prices), counts.max(initial=0)))
+    positions = np.full(values.shape, -1, dtype=np.int64)
+    rows, ticks = np.nonzero(valid)
+    slots = np.cumsum(valid, axis=1)[rows, ticks] - 1
+    values[rows, slots] = prices[rows, ticks]
+    positions[rows, slots] = ticks
+    return values, positions, counts
+
+
+# --- EMA of every position once per alpha, shared by the whole grid ---
+# Same recurrence and fastmath flags as one_buy's kernel, so the EMA
+# (and every sell decision made from it) matches run_simulation exactly.
+@njit(cache=True, fastmath=FASTMATH_FLAGS)
+def smooth_all(values, counts, alphas):
+    """EMA of every compacted row under every alpha, shape (len(alphas), rows, width)."""
+    emas = np.zeros((alphas.shape[0], values.shape[0], values.shape[1]))
+    for i in range(alphas.shape[0]):
+        alpha = alphas[i]
+        for r in range(values.shape[0]):
+            if counts[r] == 0:
+                continue
+            ema = values[r, 0]
+            emas[i, r, 0] = ema
+            for j in range(1, counts[r]):
+                ema = alpha * values[r, j] + (1 - alpha) * ema
+                emas[i, r, j] = ema
+    return emas
+
+
+@njit(cache=True)
+def _sell_from_ema(values, ema, positions, count, halftime_index, min_start, max_start, gain_threshold, fall_fraction):
+    """
+    one_buy's entry and sell rules over one position's compacted prices and
+    their precomputed EMA. Returns (sell_price, start_price); sell_price is NaN
+    when no bet is placed.
+    """
+    if count == 0:
+        return np.nan, np.nan
+    start_price = values[0]
+    if not (min_start <= start_price <= max_start):
+        return np.nan, start_price
+
+    max_gain = 0.0
+    for j in range(count):
+        gain = ema[j] - start_price
+        max_gain = max(max_gain, gain)
+
+        # --- Sell conditions based on EMA-smoothed data ---
+        if max_gain >= gain_threshold and gain < gain_threshold:
+            return values[j], start_price
+        if max_gain > gain_threshold and gain <= max_gain * fall_fraction:
+            return values[j], start_price
+        if positions[j] == halftime_index and ema[j] < start_price + gain_threshold:
+            return values[j], start_price
+
+    return values[count - 1], start_price
+
+
+# No fastmath here: bankrolls must add game profits in the same order as
+# run_simulation so both give the same results.
+@njit(parallel=True, cache=True)
+def sweep(values, emas, positions, counts, lengths, offsets, rules, alpha_index,
+          halftime_fraction, start_bankroll, stake):
+    """
+    Final bankroll for every rules row (min_start, max_start, gain_threshold,
+    fall_fraction), smoothed with the alpha whose EMA is emas[alpha_index[k]].
+    """
+    bankrolls = np.empty(rules.shape[0])
+    for k in prange(rules.shape[0]):
+        min_start, max_start = rules[k, 0], rules[k, 1]
+        gain_threshold, fall_fraction = rules[k, 2], rules[k, 3]
+        ema_rows = emas[alpha_index[k]]
+        bankroll = start_bankroll
+        for g in range(offsets.shape[0] - 1):
+            game_profit = 0.0
+            for r in range(offsets[g], offsets[g + 1]):
+                sell_price, start_price = _sell_from_ema(
+                    values[r], ema_rows[r], positions[r], counts[r], int(lengths[r] * halftime_fraction),
+                    min_start, max_start, gain_threshold, fall_fraction
+                )
+                if not np.isnan(sell_price):
+                    game_profit += stake * ((sell_price / start_price) - 1)
+            bankroll += game_profit
+        bankrolls[k] = bankroll
+    return bankrolls
+
+
+def sweep_numpy(values, emas, positions, counts, lengths, offsets, rules, alpha_index,
+                halftime_fraction, start_bankroll, stake):
+    """
+    Same results as sweep, with the sell rules evaluated for all positions at
+    once: a running max of the gain and boolean masks, then the first tick
+    where any condition holds.
+    """
+    if values.shape[1] == 0:  # no valid prices anywhere: no bets are placed
+        return np.full(rules.shape[0], start_bankroll)
+
+    rows = np.arange(values.shape[0])
+    in_row = np.arange(values.shape[1]) < counts[:, None]
+    at_halftime = positions == (lengths * halftime_fraction).astype(np.int64)[:, None]
+    last_tick = np.maximum(counts - 1, 0)
+    start_price = values[:, 0]
+
+    bankrolls = np.empty(rules.shape[0])
+    for k in range(rules.shape[0]):
+        min_start, max_start, gain_threshold, fall_fraction = rules[k]
+        ema = emas[alpha_index[k]]
+
+        gain = ema - start_price[:, None]
+        max_gain = np.maximum.accumulate(np.maximum(gain, 0.0), axis=1)
+        sell = (max_gain >= gain_threshold) & (gain < gain_threshold)
+        sell |= (max_gain > gain_threshold) & (gain <= max_gain * fall_fraction)
+        sell |= at_halftime & (ema < (start_price + gain_threshold)[:, None])
+        sell &= in_row
+
+        sell_tick = np.where(sell.any(axis=1), sell.argmax(axis=1), last_tick)
+        sell_price = values[rows, sell_tick]
+        entered = (counts > 0) & (min_start <= start_price) & (start_price <= max_start)
+        profit = np.where(entered, stake * ((sell_price / np.where(entered, start_price, 1.0)) - 1), 0.0)
+
+        # games summed one after another, in run_simulation's order
+        game_profit = np.add.reduceat(profit, offsets[:-1])
+        bankrolls[k] = np.add.accumulate(np.concatenate(([start_bankroll], game_profit)))[-1]
+    return bankrolls
+
+
+def run_batch(games, batch, batch_alpha_index):
+    """games = (values, emas, positions, counts, lengths, offsets)."""
+    kernel = sweep_numpy if SWEEP_BACKEND == "numpy" else sweep
+    return kernel(*games, batch, batch_alpha_index, HALFTIME_FRACTION, START_BANKROLL, FLAT_BET_AMOUNT)
+
+
+# --- Pool fallback: workers attach to one shared copy of the big arrays ---
+_shms = []
+_games = _rules = _alpha_index = None
+
+
+def init_worker(shared_specs, small_arrays, rules, alpha_index):
+    """Attach to the shared game arrays once for the lifetime of the worker."""
+    global _games, _rules, _alpha_index
+    set_num_threads(1)  # the pool already supplies one process per core
+    shared = []
+    for name, shape, dtype in shared_specs:
+        shm = shared_memory.SharedMemory(name=name)
+        _shms.append(shm)
+        shared.append(np.ndarray(shape, dtype, buffer=shm.buf))
+    _games = (*shared, *small_arrays)
+    _rules, _alpha_index = rules, alpha_index
+
+
+def run_range(lo_hi):
+    """Sweep rules rows lo:hi; returns (lo, bankrolls)."""
+    lo, hi = lo_hi
+    return lo, run_batch(_games, _rules[lo:hi], _alpha_index[lo:hi])
+
+
+def write_results(writer, batch_params, batch_bankrolls, best):
+    """
+    Write one batch's CSV rows (rounded as reported) CSV_SLICE_ROWS at a time
+    and return the best row so far; ties keep the row written first.
+    """
+    for lo in range(0, len(batch_bankrolls), CSV_SLICE_ROWS):
+        hi = lo + CSV_SLICE_ROWS
+        writer.writerows(np.column_stack([batch_params[lo:hi].round(3), batch_bankrolls[lo:hi].round(2)]).tolist())
+    if len(batch_bankrolls) == 0:
+        return best
+    rounded = batch_bankrolls.round(2)
+    i = int(np.argmax(rounded))
+    if best is None or rounded[i] > best[-1]:
+        best = batch_params[i].round(3).tolist() + [rounded[i].item()]
+    return best
+
+
+if __name__ == "__main__":
+    # --- Generate all combinations ---
+    min_starts = np.arange(*MIN_START_RANGE)
+    max_starts = np.arange(*MAX_START_RANGE)
+    gain_thresholds = np.arange(*GAIN_THRESHOLD_RANGE)
+    fall_fractions = np.arange(*FALL_FRACTION_RANGE)
+    alphas = np.arange(*ALPHA_RANGE)
+
+    grids = np.meshgrid(min_starts, max_starts, gain_thresholds, fall_fractions, alphas, indexing="ij")
+    params = np.stack([g.ravel() for g in grids], axis=1)
+    params = params[params[:, 1] > params[:, 0]]  # ensure valid range
+
+    total_combos = len(params)
+    print(f"🧮 Total parameter combinations: {total_combos}")
+
+    # --- Smooth every position once per distinct alpha ---
+    prices, lengths, offsets = build_price_matrix()
+    values, positions, counts = compact_rows(prices)
+    sweep_alphas, alpha_index = np.unique(params[:, 4], return_inverse=True)
+    emas = smooth_all(values, counts, sweep_alphas)
+    games = (values, emas, positions, counts, lengths, offsets)
+
+    # combos grouped by alpha, so each stretch of the sweep reads a single EMA block
+    order = np.argsort(alpha_index, kind="stable")
+    rules, alpha_index = params[order, :4], alpha_index[order]
+
+    # --- Run parameter sweep, writing each batch's rows as it arrives ---
+    start_time = time.time()
+    os.makedirs("sweeps", exist_ok=True)
+    csv_path = os.path.join("sweeps", "sweep_ema_results.csv")
+    best = None
+
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["MIN_START","MAX_START","GAIN_THRESHOLD","FALL_FRACTION","ALPHA","FINAL_BANKROLL"])
+
+        if total_combos <= MAX_IN_PROCESS_COMBOS:
+            bankrolls = np.empty(total_combos)
+            bankrolls[order] = run_batch(games, rules, alpha_index)  # back to grid order
+            best = write_results(writer, params, bankrolls, best)
+        else:
+            # --- Split work into small row ranges ---
+            num_cores = max(1, cpu_count() - 1)
+            ranges = [(i, min(i + COMBOS_PER_TASK, total_combos)) for i in range(0, total_combos, COMBOS_PER_TASK)]
+            print(f"⚙️ Using {num_cores} CPU cores ({len(ranges)} tasks of {COMBOS_PER_TASK} combos)")
+
+            blocks = []
+            try:
+                shared_specs = []
+                for array in (values, emas, positions):
+                    shm = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+                    blocks.append(shm)
+                    np.ndarray(array.shape, array.dtype, buffer=shm.buf)[:] = array
+                    shared_specs.append((shm.name, array.shape, array.dtype))
+                initargs = (shared_specs, (counts, lengths, offsets), rules, alpha_index)
+
+                completed = 0
+                last_report = start_time
+                with Pool(num_cores, initializer=init_worker, initargs=initargs) as pool:
+                    results = pool.imap_unordered(run_range, ranges, chunksize=TASKS_PER_DISPATCH)
+                    for lo, batch_bankrolls in results:
+                        batch_params = params[order[lo:lo + len(batch_bankrolls)]]
+                        best = write_results(writer, batch_params, batch_bankrolls, best)
+                        completed += len(batch_bankrolls)
+                        now = time.time()
+                        if completed < total_combos and now - last_report < PROGRESS_INTERVAL:
+                            continue
+                        last_report = now
+                        f.flush()
+                        elapsed = now - start_time
+                        progress = min(100, completed / total_combos * 100)
+                        print(f"Progress: {progress:.2f}% | Completed: {completed}/{total_combos} | "
+                              f"Best bankroll so far: ${best[-1]:.2f} | Elapsed: {elapsed/60:.1f} min")
+            finally:
+                for shm in blocks:
+                    shm.close()
+                    shm.unlink()
+
+    print(f"Swept {total_combos} combinations in {time.time() - start_time:.1f} s")
+
+    # --- Best result ---
+    print("\n🏆 Best parameters found:")
+    print(f"MIN_START: {best[0]}")
+    print(f"MAX_START: {best[1]}")
+    print(f"GAIN_THRESHOLD: {best[2]}")
+    print(f"FALL_FRACTION: {best[3]}")
+    print(f"EMA ALPHA: {best[4]}")
+    print(f"Best bankroll: ${best[5]:.2f}")
+    print(f"Results saved to {csv_path}")